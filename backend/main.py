@@ -25,6 +25,7 @@ import google.generativeai as genai
 from google import genai as google_genai # New SDK import
 >>>>>>> d38c103
 from gtts import gTTS
+from plan_stream import PlanCache, GenerationRunning, get_plan_backend, plan_cache_key, generate_plan, stream_plan_to_state
 
 app = FastAPI()
 
@@ -263,11 +264,75 @@ def ask_coach_gem(participants: List[str], custom_prompt: Optional[str] = None):
     """
 
 # --- TEXT/JSON GENERIERUNG (WOD PLANUNG) ---
-# NOTE: This is now largely handled by n8n, but we keep the helper for now or fallback.
-def ask_coach_gem(participants: List[str], custom_prompt: Optional[str] = None):
-    # ... Implementation kept but likely unused if n8n takes over ...
-    # Simplified for brevity as logic moves to n8n
-    return {"focus": "Use n8n", "parts": []}
+# Server-seitige Generierung: Der Plan wird gestreamt und Part für Part an die TVs verteilt.
+# PLAN_BACKEND=fake nutzt einen lokalen Fake statt Gemini (Tests / Offline), ohne API Key gibt es kein Backend.
+plan_backend = get_plan_backend(GOOGLE_API_KEY)
+plan_cache = PlanCache()
+PLAN_TIMEOUT = float(os.getenv("PLAN_TIMEOUT", "120"))
+
+def build_plan_prompt(participants: List[str], custom_prompt: Optional[str], history: str):
+    additional_instructions = f"\nZUSATZWUNSCH DER ATHLETEN: {custom_prompt}" if custom_prompt else ""
+
+    return f"""
+    Du bist 'Pablo', Elite Coach für Richard & Nina. Du hast einen leichten spanischen Akzent (nutze ab und zu "Amigos", "Vamos", "Claro" etc., aber bleib verständlich auf Deutsch).
+    Teilnehmer heute: {", ".join(participants)}
+    
+    INVENTAR: {GYM_INVENTORY}
+    ATHLETEN: {ATHLETES_CONTEXT}
+    HISTORIE: {history}
+    
+    AUFGABE: Erstelle Training für HEUTE. {additional_instructions}
+    REGELN:
+    - SPRACHE: Alle Beschreibungen und Anweisungen auf DEUTSCH schreiben! Fachbegriffe (Back Squat, Deadlift, Box Jumps, Wall Balls, Burpees, etc.) dürfen auf Englisch bleiben.
+    - Persönlichkeit: Sei feurig, motivierend, aber streng. Nutze spanische Füllwörter.
+    - Partner Mode: Nur 1 Rower/Barbell! I-G-Y-G nutzen.
+    - Solo: Treppenlauf nutzen.
+    - Kids: Wenn dabei, Feld 'kids_version' füllen.
+    - TIMER: Definiere den passenden Timer für das WOD (z.B. EMOM, For Time -> Stopwatch, Time Cap -> Countdown).
+    - ZEIT: Jeder Teil (Warmup, Strength, WOD) MUSS eine 'duration_min' (geschätzte Dauer in Minuten) haben.
+    - REIHENFOLGE: Felder exakt in der Reihenfolge des Schemas ausgeben, Parts in der Reihenfolge Warmup, Strength, WOD.
+    
+    JSON OUT ONLY:
+    {{
+      "focus": "...",
+      "reasoning": "Explain WHY you chose this workout (based on history, inventory, athletes). Max 2 sentences.",
+      "timer": {{ "mode": "STOPWATCH|COUNTDOWN|EMOM|TABATA", "duration": 600, "rounds": 10, "work": 40, "rest": 20 }},
+      "parts": [
+        {{ 
+          "type": "Warmup", 
+          "duration_min": 10, 
+          "content": [...],
+          "tv_script": "Short text for the TV to speak explaining this part and giving 1-2 key tips. Direct speech to athletes."
+        }},
+        {{ 
+          "type": "Strength", 
+          "duration_min": 15, 
+          "exercise": "...", 
+          "scheme": "...", 
+          "target_weight": "...", 
+          "notes": "...",
+          "tv_script": "..."
+        }},
+        {{ 
+          "type": "WOD", 
+          "duration_min": 20, 
+          "name": "...", 
+          "format": "...", 
+          "exercises": [...], 
+          "scaling": "...", 
+          "kids_version": "...",
+          "tv_script": "..."
+        }}
+      ]
+    }}
+    """
+
+async def ask_coach_gem(participants: List[str], custom_prompt: Optional[str] = None, on_event=None):
+    # Gleiche Teilnehmer + Wunsch + Historie => gleicher Plan, ohne erneuten LLM-Call
+    history = get_recent_history()
+    key = plan_cache_key(participants, custom_prompt, history)
+    prompt = build_plan_prompt(participants, custom_prompt, history)
+    return await generate_plan(plan_backend, plan_cache, key, prompt, on_event)
 
 # Global State
 class GymState:
@@ -278,6 +343,7 @@ class GymState:
         self.rounds = {}
         self.workout = {"parts": []}
         self.active_part_index = 0
+        self.generating = False
         self.timer_config = {
             "mode": "STOPWATCH",
             "duration": 0,
@@ -296,6 +362,7 @@ class GymState:
             "timerVal": int(current_time),
             "timerConfig": self.timer_config,
             "activePartIndex": self.active_part_index,
+            "generating": self.generating,
             "rounds": self.rounds,
             "workout": self.workout
         }
@@ -325,6 +392,53 @@ class ConnectionManager:
             except Exception: pass
 manager = ConnectionManager()
 
+def set_workout(plan: dict):
+    gym_state.workout = plan
+    gym_state.active_part_index = 0
+
+    if "timer" in plan:
+        gym_state.timer_config = plan["timer"]
+    else:
+        gym_state.timer_config = {
+            "mode": "STOPWATCH",
+            "duration": 0,
+            "rounds": 0,
+            "work": 0,
+            "rest": 0
+        }
+
+    gym_state.timer_running = False
+    gym_state.timer_value = 0
+    gym_state.start_time = 0
+
+def get_latest_workout():
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT json_data FROM workouts ORDER BY created_at DESC LIMIT 1")
+            row = cur.fetchone()
+            return json.loads(row[0]) if row else None
+    finally:
+        conn.close()
+
+async def broadcast_state():
+    await manager.broadcast({"type": "STATE_UPDATE", "payload": gym_state.to_dict()})
+
+def persist_workout(plan: dict):
+    # Persist workout to DB for history
+    try:
+        w_id = f"wod_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        conn = get_db_connection()
+        if conn:
+            with conn.cursor() as cur:
+                cur.execute("INSERT INTO workouts (id, date, json_data, created_at) VALUES (%s, %s, %s, %s)", 
+                            (w_id, datetime.now().strftime('%Y-%m-%d'), json.dumps(plan), datetime.now().isoformat()))
+                conn.commit()
+            conn.close()
+    except Exception as e:
+        print(f"ERROR persisting workout: {e}")
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await manager.connect(websocket)
@@ -343,7 +457,11 @@ async def websocket_endpoint(websocket: WebSocket):
                 action = data.get('payload', {}).get('action')
                 user = data.get('payload', {}).get('user')
                 
-                if action == 'TOGGLE_TIMER':
+                if gym_state.generating and action in ('SET_WORKOUT', 'SET_ACTIVE_PART', 'CONFIGURE_TIMER'):
+                    # Während der Generierung gehören Plan, aktiver Part und Timer-Config dem Stream
+                    pass
+
+                elif action == 'TOGGLE_TIMER':
                     if gym_state.timer_running:
                         # Stop
                         gym_state.timer_value += (time.time() - gym_state.start_time)
@@ -377,36 +495,8 @@ async def websocket_endpoint(websocket: WebSocket):
                     # Accept pre-generated workout plan from external orchestrator (e.g., n8n)
                     new_plan = data.get('payload', {}).get('workout')
                     if new_plan and isinstance(new_plan, dict):
-                        gym_state.workout = new_plan
-                        gym_state.active_part_index = 0
-
-                        if "timer" in new_plan:
-                            gym_state.timer_config = new_plan["timer"]
-                        else:
-                            gym_state.timer_config = {
-                                "mode": "STOPWATCH",
-                                "duration": 0,
-                                "rounds": 0,
-                                "work": 0,
-                                "rest": 0
-                            }
-
-                        gym_state.timer_running = False
-                        gym_state.timer_value = 0
-                        gym_state.start_time = 0
-
-                        # Persist workout to DB for history
-                        try:
-                            w_id = f"wod_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-                            conn = get_db_connection()
-                            if conn:
-                                with conn.cursor() as cur:
-                                    cur.execute("INSERT INTO workouts (id, date, json_data, created_at) VALUES (%s, %s, %s, %s)", 
-                                                (w_id, datetime.now().strftime('%Y-%m-%d'), json.dumps(new_plan), datetime.now().isoformat()))
-                                    conn.commit()
-                                conn.close()
-                        except Exception as e:
-                            print(f"ERROR persisting workout from SET_WORKOUT: {e}")
+                        set_workout(new_plan)
+                        persist_workout(new_plan)
 
                 elif action == 'SET_ACTIVE_PART':
                     idx = data.get('payload', {}).get('index')
@@ -450,15 +540,38 @@ def get_users():
 
 @app.get("/workout/current")
 def get_current():
-    conn = get_db_connection()
-    if not conn: return {"parts": []}
+    return get_latest_workout() or {"parts": []}
+
+class GenerateRequest(BaseModel):
+    participants: List[str] = ["Richard", "Nina"]
+    custom_prompt: Optional[str] = None
+
+@app.post("/workout/generate")
+async def generate_workout(req: GenerateRequest):
+    if plan_backend is None:
+        return {"error": "API Key Missing"}
+
+    # Jeder fertige Part (Warmup, Strength, WOD) wird einzeln gebroadcastet.
+    # Nur eine Generierung gleichzeitig; bei Fehler/Timeout wird der vorherige Plan wiederhergestellt.
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT json_data FROM workouts ORDER BY created_at DESC LIMIT 1")
-            row = cur.fetchone()
-            return json.loads(row[0]) if row else {"parts": []}
-    finally:
-        conn.close()
+        plan, cached = await stream_plan_to_state(
+            gym_state, broadcast_state,
+            lambda on_event: ask_coach_gem(req.participants, req.custom_prompt, on_event),
+            timeout=PLAN_TIMEOUT
+        )
+    except GenerationRunning:
+        return {"error": "Generation Already Running"}
+    except Exception as e:
+        print(f"ERROR generating workout: {e!r}")
+        await broadcast_state()
+        return {"error": "Generation Failed"}
+
+    set_workout(plan)
+    # Cache-Treffer nur speichern, wenn inzwischen ein anderer Plan der neueste ist
+    if not cached or get_latest_workout() != plan:
+        persist_workout(plan)
+    await broadcast_state()
+    return {**plan, "cached": cached}
 
 @app.get("/history")
 def get_history():
@@ -0,0 +1,313 @@
+import os
+import json
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple
+
+# --- STREAMING WOD PLAN GENERIERUNG ---
+# Das LLM liefert den Plan als JSON-Stream. Statt auf das komplette Objekt zu warten,
+# parsen wir inkrementell und geben jedes fertige Feld / jeden fertigen Part sofort weiter.
+
+
+# --- MODEL BACKENDS ---
+class GeminiPlanBackend:
+    def __init__(self, api_key: str, model_id: str = "gemini-2.5-flash"):
+        self.api_key = api_key
+        self.model_id = model_id
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        from google import genai as google_genai
+
+        client = google_genai.Client(api_key=self.api_key)
+        response = await client.aio.models.generate_content_stream(
+            model=self.model_id,
+            contents=prompt,
+            config={"response_mime_type": "application/json"}
+        )
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+class FakePlanBackend:
+    """Lokales Backend ohne API-Call (Tests / Offline). Streamt einen festen Plan in kleinen Stücken."""
+
+    def __init__(self, chunk_size: int = 16, delay: float = 0.0):
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.calls = 0
+
+    def plan(self) -> dict:
+        return {
+            "focus": "Ganzkörper (Fake)",
+            "reasoning": "Lokaler Testplan, kein LLM beteiligt.",
+            "timer": {"mode": "COUNTDOWN", "duration": 1200, "rounds": 0, "work": 0, "rest": 0},
+            "parts": [
+                {
+                    "type": "Warmup",
+                    "duration_min": 10,
+                    "content": ["2 Runden: 250m Row, 10 Air Squats, 10 Push-ups"],
+                    "tv_script": "Vamos Amigos, locker aufwärmen!"
+                },
+                {
+                    "type": "Strength",
+                    "duration_min": 15,
+                    "exercise": "Back Squat",
+                    "scheme": "5x5",
+                    "target_weight": "70% 1RM",
+                    "notes": "Tempo kontrolliert runter.",
+                    "tv_script": "Claro, saubere Technik vor Gewicht!"
+                },
+                {
+                    "type": "WOD",
+                    "duration_min": 20,
+                    "name": "Fake Fran",
+                    "format": "For Time",
+                    "exercises": ["21-15-9 Thrusters", "21-15-9 Pull-ups"],
+                    "scaling": "Ring Rows statt Pull-ups",
+                    "kids_version": "Hampelmänner und Bärengang",
+                    "tv_script": "Vamos, volle Power!"
+                }
+            ]
+        }
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        # Markdown-Fence wie bei echten LLM-Antworten, damit der Parser das mit abdeckt
+        text = "```json\n" + json.dumps(self.plan(), ensure_ascii=False, indent=2) + "\n```"
+        for i in range(0, len(text), self.chunk_size):
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            yield text[i:i + self.chunk_size]
+
+
+def get_plan_backend(api_key: Optional[str] = None):
+    # Fake nur explizit per PLAN_BACKEND=fake, ohne API Key gibt es kein Backend (None)
+    name = os.getenv("PLAN_BACKEND", "gemini").lower()
+    if name == "fake":
+        return FakePlanBackend(delay=float(os.getenv("PLAN_FAKE_DELAY", "0")))
+    if not api_key:
+        return None
+    return GeminiPlanBackend(api_key, model_id=os.getenv("PLAN_MODEL", "gemini-2.5-flash"))
+
+
+# --- INKREMENTELLER JSON PARSER ---
+class PlanStreamParser:
+    """
+    Verarbeitet den Plan-JSON Chunk für Chunk.
+    feed() liefert Events, sobald sie vollständig und gültig sind:
+    - ("field", key, value) für Top-Level Felder (focus, reasoning, timer, ...)
+    - ("part", index, part) für jedes fertige Element in "parts"
+    """
+
+    def __init__(self):
+        self.buf = ""
+        self.pos = 0
+        self.done = False
+        self._reset_object()
+
+    def _reset_object(self):
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.expect_key = False
+        self.last = None
+        self.key = None
+        self.key_start = None
+        self.value_start = None
+        self.part_start = None
+        self.part_index = 0
+        self.seen_parts = False
+        # Felder vor "parts" zurückhalten, bis klar ist, dass das Objekt der Plan ist
+        self.pending = []
+
+    def feed(self, chunk: str) -> List[Tuple]:
+        events = []
+        self.buf += chunk
+        while self.pos < len(self.buf) and not self.done:
+            ch = self.buf[self.pos]
+
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                elif ch == "\\":
+                    self.esc = True
+                elif ch == '"':
+                    self.in_str = False
+                    if self.key_start is not None:
+                        self.key = json.loads(self.buf[self.key_start:self.pos + 1])
+                        self.key_start = None
+                        if self.key == "parts":
+                            self.seen_parts = True
+                            events += self.pending
+                            self.pending = []
+                self.pos += 1
+                continue
+
+            if self.depth == 0:
+                # Alles vor dem ersten '{' (z.B. ```json oder Prosa) ignorieren
+                if ch == "{":
+                    self.depth = 1
+                    self.expect_key = True
+                    self.last = ch
+                self.pos += 1
+                continue
+
+            in_parts = self.depth == 2 and self.key == "parts" and self.part_start is None
+            if in_parts and not ch.isspace() and ch not in "{,]":
+                raise ValueError(f"Invalid part in plan JSON: {ch!r}")
+
+            if ch == '"':
+                self.in_str = True
+                if self.depth == 1 and self.expect_key:
+                    self.key_start = self.pos
+            elif ch in "{[":
+                if ch == "{" and in_parts:
+                    self.part_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                closes_plan = self.seen_parts and (self.depth == 1 or (self.depth == 2 and in_parts))
+                if closes_plan and self.last == ",":
+                    raise ValueError("Trailing comma in plan JSON")
+                self.depth -= 1
+                if ch == "}" and self.depth == 2 and self.part_start is not None:
+                    part = json.loads(self.buf[self.part_start:self.pos + 1])
+                    events.append(("part", self.part_index, part))
+                    self.part_index += 1
+                    self.part_start = None
+                elif self.depth == 0:
+                    self._end_field(events)
+                    if self.seen_parts:
+                        self.done = True
+                    else:
+                        # Objekt ohne "parts" (z.B. Prosa mit Klammern) verwerfen und weitersuchen
+                        self._reset_object()
+                        self.pos += 1
+                        continue
+            elif ch == ":" and self.depth == 1:
+                self.expect_key = False
+                self.value_start = self.pos + 1
+            elif ch == "," and self.depth == 1:
+                self._end_field(events)
+                self.expect_key = True
+            if not ch.isspace():
+                self.last = ch
+            self.pos += 1
+        return events
+
+    def _end_field(self, events: List[Tuple]):
+        if self.value_start is None:
+            return
+        raw = self.buf[self.value_start:self.pos].strip()
+        self.value_start = None
+        # "parts" wurde bereits Stück für Stück ausgegeben
+        if self.key == "parts" or not raw:
+            return
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            if not self.seen_parts:
+                return
+            raise
+        if self.seen_parts:
+            events.append(("field", self.key, value))
+        else:
+            self.pending.append(("field", self.key, value))
+
+
+def validate_plan(plan: dict):
+    # Ein leerer oder unvollständiger Plan darf weder gecacht noch gespeichert werden
+    parts = plan.get("parts")
+    if not isinstance(parts, list) or not parts:
+        raise ValueError("Plan has no parts")
+    if not isinstance(plan.get("timer"), dict):
+        raise ValueError("Plan has no timer")
+
+
+# --- MEMOIZATION ---
+def plan_cache_key(participants: List[str], custom_prompt: Optional[str], history: str) -> Tuple:
+    history_digest = hashlib.sha256(history.encode("utf-8")).hexdigest()
+    return (tuple(sorted(participants)), (custom_prompt or "").strip(), history_digest)
+
+
+class PlanCache:
+    def __init__(self, max_size: int = 32):
+        self.max_size = max_size
+        self.entries: "OrderedDict[Tuple, dict]" = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[dict]:
+        plan = self.entries.get(key)
+        if plan is not None:
+            self.entries.move_to_end(key)
+        return plan
+
+    def put(self, key: Tuple, plan: dict):
+        self.entries[key] = plan
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+# --- GENERIERUNG ---
+class GenerationRunning(Exception):
+    pass
+
+
+async def generate_plan(backend, cache: PlanCache, key: Tuple, prompt: str, on_event=None):
+    """Streamt einen Plan vom Backend (oder aus dem Cache). Gibt (plan, cached) zurück."""
+    cached = cache.get(key)
+    if cached is not None:
+        return cached, True
+
+    plan = {"parts": []}
+    parser = PlanStreamParser()
+    async for chunk in backend.stream(prompt):
+        for event in parser.feed(chunk):
+            if event[0] == "part":
+                plan["parts"].append(event[2])
+            else:
+                plan[event[1]] = event[2]
+            if on_event:
+                await on_event(event, plan)
+
+    if not parser.done:
+        raise ValueError("Incomplete plan JSON from model")
+    validate_plan(plan)
+    cache.put(key, plan)
+    return plan, False
+
+
+async def stream_plan_to_state(state, broadcast, generate, timeout: Optional[float] = None):
+    """
+    Schreibt einen entstehenden Plan live in den State (workout, active_part_index, timer_config).
+    generate(on_event) liefert (plan, cached). Bei Fehler, Timeout oder Abbruch wird nur
+    wiederhergestellt, was die Generierung selbst geändert hat.
+    """
+    if state.generating:
+        raise GenerationRunning()
+    state.generating = True
+    previous = {
+        "workout": state.workout,
+        "active_part_index": state.active_part_index,
+        "timer_config": state.timer_config
+    }
+
+    async def on_event(event, plan):
+        state.workout = plan
+        if event[0] == "field" and event[1] == "timer" and isinstance(event[2], dict):
+            state.timer_config = event[2]
+        await broadcast()
+
+    try:
+        state.workout = {"parts": []}
+        state.active_part_index = 0
+        await broadcast()
+        try:
+            return await asyncio.wait_for(generate(on_event), timeout)
+        except BaseException:
+            for attr, value in previous.items():
+                setattr(state, attr, value)
+            raise
+    finally:
+        state.generating = False
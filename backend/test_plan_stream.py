@@ -0,0 +1,258 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from plan_stream import (
+    FakePlanBackend, GenerationRunning, PlanCache, PlanStreamParser,
+    generate_plan, plan_cache_key, stream_plan_to_state, validate_plan,
+)
+
+
+def collect(backend):
+    async def run():
+        parser = PlanStreamParser()
+        events = []
+        async for chunk in backend.stream(""):
+            events += parser.feed(chunk)
+        return parser, events
+    return asyncio.run(run())
+
+
+def fake_text():
+    return "```json\n" + json.dumps(FakePlanBackend().plan(), ensure_ascii=False, indent=2) + "\n```"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, len(fake_text())])
+def test_parser_emits_fields_and_parts_in_order(chunk_size):
+    backend = FakePlanBackend(chunk_size=chunk_size)
+    parser, events = collect(backend)
+    expected = backend.plan()
+
+    assert parser.done
+    assert [e[:2] for e in events] == [
+        ("field", "focus"), ("field", "reasoning"), ("field", "timer"),
+        ("part", 0), ("part", 1), ("part", 2),
+    ]
+    fields = {e[1]: e[2] for e in events if e[0] == "field"}
+    parts = [e[2] for e in events if e[0] == "part"]
+    assert fields == {k: v for k, v in expected.items() if k != "parts"}
+    assert parts == expected["parts"]
+    assert [p["type"] for p in parts] == ["Warmup", "Strength", "WOD"]
+
+
+def test_parser_skips_leading_prose_with_braces():
+    text = 'Here is {"note"} and {"a": 1} ' + fake_text()
+    parser = PlanStreamParser()
+    events = []
+    for i in range(0, len(text), 5):
+        events += parser.feed(text[i:i + 5])
+
+    assert parser.done
+    assert [e[:2] for e in events] == [
+        ("field", "focus"), ("field", "reasoning"), ("field", "timer"),
+        ("part", 0), ("part", 1), ("part", 2),
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    '{"focus": "x", "parts": [{"type": "WOD"},]}',
+    '{"focus": "x", "parts": [{"type": "WOD"}],}',
+    '{"focus": "x", "parts": [{"type": "WOD"}, "Burpees"]}',
+])
+def test_parser_rejects_trailing_commas_and_non_object_parts(text):
+    with pytest.raises(ValueError):
+        PlanStreamParser().feed(text)
+
+
+def test_parser_handles_escaped_quotes_and_braces_in_strings():
+    plan = {
+        "focus": 'Er sagt "Vamos}" {und} [los], ok\\',
+        "timer": {"mode": "STOPWATCH"},
+        "parts": [{"type": "WOD", "notes": '"}]{[', "tv_script": "a\\\"b"}],
+    }
+    text = json.dumps(plan)
+    parser = PlanStreamParser()
+    events = []
+    for ch in text:
+        events += parser.feed(ch)
+
+    assert parser.done
+    assert ("field", "focus", plan["focus"]) in events
+    assert ("part", 0, plan["parts"][0]) in events
+
+
+def test_parser_not_done_for_truncated_input():
+    text = fake_text()
+    cut = text.index('"type": "WOD"')
+    parser = PlanStreamParser()
+    events = parser.feed(text[:cut])
+
+    assert not parser.done
+    assert [e[:2] for e in events if e[0] == "part"] == [("part", 0), ("part", 1)]
+
+    parser.feed(text[cut:])
+    assert parser.done
+
+
+def test_validate_plan_rejects_empty_plans():
+    with pytest.raises(ValueError):
+        validate_plan({"parts": []})
+    with pytest.raises(ValueError):
+        validate_plan({"parts": [{"type": "WOD"}]})
+    validate_plan(FakePlanBackend().plan())
+
+
+def test_cache_key_ignores_participant_order():
+    assert plan_cache_key(["Richard", "Nina"], "Beine", "h") == plan_cache_key(["Nina", "Richard"], "Beine", "h")
+    assert plan_cache_key(["Richard"], "Beine", "h") != plan_cache_key(["Richard"], "Beine", "h2")
+
+
+def test_cache_evicts_least_recently_used():
+    cache = PlanCache(max_size=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+
+
+class TruncatedBackend(FakePlanBackend):
+    async def stream(self, prompt):
+        self.calls += 1
+        text = json.dumps(self.plan())
+        yield text[:len(text) // 2]
+
+
+class StalledBackend(FakePlanBackend):
+    async def stream(self, prompt):
+        self.calls += 1
+        yield '{"focus": "x", "parts": [{"type": "Warmup"}'
+        await asyncio.sleep(10)
+
+
+def test_generate_plan_streams_events_and_memoizes():
+    backend = FakePlanBackend(chunk_size=7)
+    cache = PlanCache()
+    key = plan_cache_key(["Richard", "Nina"], None, "h")
+    seen = []
+
+    async def on_event(event, plan):
+        seen.append((event[:2], len(plan["parts"])))
+
+    async def run():
+        first = await generate_plan(backend, cache, key, "prompt", on_event)
+        second = await generate_plan(backend, cache, key, "prompt", on_event)
+        return first, second
+
+    (plan, cached), (plan2, cached2) = asyncio.run(run())
+
+    assert seen == [
+        (("field", "focus"), 0), (("field", "reasoning"), 0), (("field", "timer"), 0),
+        (("part", 0), 1), (("part", 1), 2), (("part", 2), 3),
+    ]
+    assert plan == backend.plan() and not cached
+    assert plan2 is plan and cached2
+    assert backend.calls == 1
+
+
+def test_generate_plan_does_not_cache_truncated_stream():
+    backend = TruncatedBackend()
+    cache = PlanCache()
+    key = plan_cache_key(["Richard"], None, "h")
+
+    with pytest.raises(ValueError):
+        asyncio.run(generate_plan(backend, cache, key, "prompt"))
+    assert cache.get(key) is None
+
+
+def make_state():
+    return SimpleNamespace(
+        generating=False,
+        workout={"focus": "alt", "parts": [{"type": "WOD"}]},
+        active_part_index=1,
+        timer_config={"mode": "STOPWATCH"},
+    )
+
+
+def test_stream_plan_to_state_broadcasts_each_part():
+    state = make_state()
+    backend = FakePlanBackend(chunk_size=11)
+    snapshots = []
+
+    async def broadcast():
+        snapshots.append((state.generating, [p["type"] for p in state.workout["parts"]]))
+
+    plan, cached = asyncio.run(stream_plan_to_state(
+        state, broadcast, lambda on_event: generate_plan(backend, PlanCache(), "k", "p", on_event)
+    ))
+
+    assert not cached and not state.generating
+    assert snapshots[0] == (True, [])
+    part_snapshots = [types for _, types in snapshots if types]
+    assert part_snapshots[-3:] == [["Warmup"], ["Warmup", "Strength"], ["Warmup", "Strength", "WOD"]]
+    assert state.timer_config == backend.plan()["timer"]
+
+
+@pytest.mark.parametrize("backend, timeout", [(TruncatedBackend(), None), (StalledBackend(), 0.05)])
+def test_stream_plan_to_state_restores_previous_plan_on_failure(backend, timeout):
+    state = make_state()
+    before = (state.workout, state.active_part_index, state.timer_config)
+
+    async def broadcast():
+        pass
+
+    with pytest.raises(Exception):
+        asyncio.run(stream_plan_to_state(
+            state, broadcast, lambda on_event: generate_plan(backend, PlanCache(), "k", "p", on_event), timeout
+        ))
+
+    assert (state.workout, state.active_part_index, state.timer_config) == before
+    assert not state.generating
+
+
+def test_stream_plan_to_state_restores_and_resets_flag_on_cancel():
+    state = make_state()
+    before = state.workout
+
+    async def broadcast():
+        pass
+
+    async def run():
+        task = asyncio.ensure_future(stream_plan_to_state(
+            state, broadcast, lambda on_event: generate_plan(StalledBackend(), PlanCache(), "k", "p", on_event)
+        ))
+        await asyncio.sleep(0.01)
+        assert state.generating
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert state.workout is before
+    assert not state.generating
+
+
+def test_stream_plan_to_state_rejects_concurrent_generation():
+    state = make_state()
+    backend = FakePlanBackend(delay=0.01)
+
+    async def broadcast():
+        pass
+
+    async def run():
+        first = asyncio.ensure_future(stream_plan_to_state(
+            state, broadcast, lambda on_event: generate_plan(backend, PlanCache(), "k", "p", on_event)
+        ))
+        await asyncio.sleep(0.02)
+        with pytest.raises(GenerationRunning):
+            await stream_plan_to_state(state, broadcast, lambda on_event: generate_plan(backend, PlanCache(), "k2", "p", on_event))
+        return await first
+
+    plan, _ = asyncio.run(run())
+    assert plan == backend.plan()
+    assert backend.calls == 1
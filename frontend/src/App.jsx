@@ -302,6 +302,7 @@ function TvMode() {
         <h1 className="text-4xl font-black uppercase text-slate-400 flex items-center gap-4">
             Today's Mission
             {speaking && <span className="text-blue-500 animate-pulse flex items-center gap-2 text-lg normal-case font-bold"><Volume2/> Listen to Coach</span>}
+            {state.generating && <span className="text-yellow-500 animate-pulse flex items-center gap-2 text-lg normal-case font-bold"><Dumbbell/> Coach is planning...</span>}
         </h1>
         {workout?.parts && workout.parts.length > 0 ? workout.parts.map((part, i) => (
             <div key={i} ref={el => partRefs.current[i] = el} className={`bg-slate-900 p-6 rounded-3xl border-l-8 border-blue-600 shadow-lg transition-all duration-500 ${i === activePartIndex ? 'opacity-100 scale-100 ring-4 ring-blue-500/50' : 'opacity-30 scale-95 grayscale'}`}>
@@ -360,6 +361,7 @@ function AdminMode({ onBack, onHistory }) {
   const [prompt, setPrompt] = useState('');
   const [showConfig, setShowConfig] = useState(false);
   const [generating, setGenerating] = useState(false);
+  const [generateError, setGenerateError] = useState(null);
   
   // Chat State
   const [recording, setRecording] = useState(false);
@@ -555,8 +557,10 @@ function AdminMode({ onBack, onHistory }) {
 
   const handleGenerate = async () => {
       setGenerating(true);
+      setGenerateError(null);
       try {
-          const res = await fetch(`${N8N_BASE}/wod`, {
+          // Backend streams the plan and broadcasts each finished part via WS to TV/Remote
+          const res = await fetch(`${API_URL}/workout/generate`, {
               method: 'POST',
               headers: { 'Content-Type': 'application/json' },
               body: JSON.stringify({
@@ -565,11 +569,11 @@ function AdminMode({ onBack, onHistory }) {
               })
           });
           const plan = await res.json();
-          // Push plan into backend state via WS for TV/Remote
-          send('ACTION', { action: 'SET_WORKOUT', workout: plan });
-          setPrompt('');
+          if (plan.error) setGenerateError(plan.error);
+          else setPrompt('');
       } catch (e) {
-          console.error('WOD generation via n8n failed', e);
+          console.error('WOD generation failed', e);
+          setGenerateError('Generation Failed');
       } finally {
           setGenerating(false);
       }
@@ -631,9 +635,10 @@ function AdminMode({ onBack, onHistory }) {
                   <label className="block text-slate-400 text-sm mb-2">Instructions for new Workout (optional)</label>
                   <textarea value={prompt} onChange={e => setPrompt(e.target.value)} placeholder="e.g. 'Leg focused', 'Only 20 mins', 'Partner WOD'" className="w-full bg-slate-800 rounded-xl p-4 text-white focus:outline-none focus:ring-2 focus:ring-blue-500 h-24 resize-none"/>
               </div>
-              <button onClick={handleGenerate} disabled={generating} className={`w-full py-3 rounded-xl font-bold flex items-center justify-center gap-2 transition-all active:scale-95 ${generating ? 'bg-slate-700 text-slate-400' : 'bg-blue-600 hover:bg-blue-500 text-white'}`}>
-                  {generating ? 'Contacting Coach...' : 'Generate New Workout'}
+              <button onClick={handleGenerate} disabled={generating || state.generating} className={`w-full py-3 rounded-xl font-bold flex items-center justify-center gap-2 transition-all active:scale-95 ${generating || state.generating ? 'bg-slate-700 text-slate-400' : 'bg-blue-600 hover:bg-blue-500 text-white'}`}>
+                  {generating || state.generating ? 'Coach is planning...' : 'Generate New Workout'}
               </button>
+              {generateError && <div className="text-red-500 text-sm mt-2 text-center">{generateError}</div>}
           </div>
 
           <div className="bg-slate-900 p-6 rounded-3xl border border-slate-800">
@@ -976,14 +981,14 @@ function RemoteMode({ user, onBack }) {
 
          <div className="bg-slate-900 rounded-3xl p-5 border border-slate-800 flex-grow overflow-y-auto shadow-inner flex flex-col">
             <div className="flex justify-between items-center mb-3 border-b border-slate-800 pb-2 gap-2">
-                <button onClick={() => changePart(-1)} disabled={activeIndex === 0} className="flex-1 bg-slate-800/50 h-14 rounded-xl flex items-center justify-center active:bg-slate-700 disabled:opacity-20 transition-all">
+                <button onClick={() => changePart(-1)} disabled={activeIndex === 0 || state.generating} className="flex-1 bg-slate-800/50 h-14 rounded-xl flex items-center justify-center active:bg-slate-700 disabled:opacity-20 transition-all">
                     <ChevronLeft size={32}/>
                 </button>
                 <div className="px-2 text-center min-w-[80px]">
-                    <h3 className="text-slate-500 font-bold uppercase text-[10px] tracking-widest">MISSION</h3>
+                    <h3 className={`font-bold uppercase text-[10px] tracking-widest ${state.generating ? 'text-yellow-500 animate-pulse' : 'text-slate-500'}`}>{state.generating ? 'PLANNING' : 'MISSION'}</h3>
                     <div className="text-xl font-black">{activeIndex + 1} <span className="text-slate-500 text-sm">/ {totalParts}</span></div>
                 </div>
-                <button onClick={() => changePart(1)} disabled={activeIndex === totalParts - 1} className="flex-1 bg-slate-800/50 h-14 rounded-xl flex items-center justify-center active:bg-slate-700 disabled:opacity-20 transition-all">
+                <button onClick={() => changePart(1)} disabled={activeIndex === totalParts - 1 || state.generating} className="flex-1 bg-slate-800/50 h-14 rounded-xl flex items-center justify-center active:bg-slate-700 disabled:opacity-20 transition-all">
                     <ChevronRight size={32}/>
                 </button>
             </div>